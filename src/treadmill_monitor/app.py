@@ -1,45 +1,57 @@
 import asyncio
+from pathlib import Path
 import sys
 import threading
 from typing import Annotated
-from typing_extensions import Literal
 
 import janus
 from treadmill_monitor.gui import Gui
-from cyclopts import App, Parameter
+from cyclopts import App, Group, Parameter, validators
 from loguru import logger
 
+from treadmill_monitor.converter import convert_files, expand_inputs
 from treadmill_monitor.interceptors import (
+    RESUMABLE_KEYS,
     GuiUpdateInterceptor,
     LoggingInterceptor,
     ResumableInterceptor,
     StdoutInterceptor,
     UpdateInterceptor,
+    resolve_interested_keys,
     run_interceptor_chain,
 )
 from treadmill_monitor.models import TreadmillUpdate
-from treadmill_monitor.producers import MtfsProducer, StdinProducer, UpdateProducer
-from treadmill_monitor.serializers import (
-    CsvSerializer,
-    JsonlSerializer,
-    UpdateSerializer,
+from treadmill_monitor.producers import (
+    TREADMILL_KEYS,
+    CaptureReplayProducer,
+    MtfsCaptureProducer,
+    MtfsProducer,
+    StdinProducer,
+    UpdateProducer,
 )
+from treadmill_monitor.serializers import Format, get_serializer
 
 
 app = App()
 
+raw_data_group = Group("Raw Data", validator=validators.MutuallyExclusive())
 
-Format = Literal["csv", "jsonl"]
+
+def setup_logging(verbose: bool) -> str:
+    log_level = "DEBUG" if verbose else "INFO"
+    logger.remove()
+    logger.add(sys.stderr, level=log_level)
+    return log_level
 
 
-def get_serializer(format: Format) -> UpdateSerializer:
-    match format:
-        case "csv":
-            return CsvSerializer(allow_missing_timestamp=True)
-        case "jsonl":
-            return JsonlSerializer()
-        case _:
-            raise ValueError(f"Unsupported format: {format}")
+def validate_keys(type_, keys: list[str] | None):
+    if keys is None:
+        return
+
+    if unknown := sorted(set(keys) - TREADMILL_KEYS):
+        raise ValueError(
+            f"Unknown keys: {', '.join(unknown)}. Valid keys are: {', '.join(sorted(TREADMILL_KEYS))}."
+        )
 
 
 @app.default
@@ -47,9 +59,14 @@ async def main(
     address: str | None = None,
     input: Annotated[Format, Parameter(name=["-i", "--input"])] = None,
     output: Annotated[Format, Parameter(name=["-o", "--output"])] = None,
+    keys: Annotated[
+        list[str] | None, Parameter(name=["-k", "--keys"], validator=validate_keys)
+    ] = None,
     resumable: Annotated[
         bool, Parameter(name=["-r", "--resumable"], negative="")
     ] = False,
+    capture: Annotated[Path | None, Parameter(group=raw_data_group)] = None,
+    replay: Annotated[Path | None, Parameter(group=raw_data_group)] = None,
     headless: Annotated[bool, Parameter(negative="")] = False,
     verbose: Annotated[bool, Parameter(negative="")] = False,
     debug: Annotated[bool, Parameter(negative="")] = False,
@@ -61,26 +78,33 @@ async def main(
         address: Optional Bluetooth address of the FTMS device to connect to, specifying this will skip device scanning.
         input: Optional format of treadmill data to read from standard input.
         output: Optional format of treadmill data to write to standard output.
+        keys: Optional keys of treadmill data to write to standard output, all keys are written if not specified. Requires `--output`.
         resumable: Enable resumable mode that accumulates certain metrics across sessions until the application is closed.
+        capture: Optional path of a file to record raw treadmill data to instead of decoding it.
+        replay: Optional path of a file recorded with `--capture` to decode instead of connecting to a treadmill; in headless mode the application exits once the whole file is replayed.
         headless: Run in headless mode without GUI.
         verbose: Enable verbose logging.
         debug: Enable WebView debug mode and verbose logging.
     """
-    log_level = "DEBUG" if debug or verbose else "INFO"
-    logger.remove()
-    logger.add(sys.stderr, level=log_level)
+    log_level = setup_logging(debug or verbose)
+
+    if keys and not output:
+        logger.warning(
+            "Ignoring --keys, they only apply to data written with --output."
+        )
 
-    interceptors: list[UpdateInterceptor] = [LoggingInterceptor("DEBUG")]
+    interceptors: list[UpdateInterceptor] = [
+        LoggingInterceptor("DEBUG", min_level=log_level)
+    ]
     close_event = threading.Event()
 
     if resumable:
         logger.info("Enabling resumable mode for certain metrics.")
-        keys_to_accumulate = ["time_elapsed", "distance_total", "energy_total"]
-        interceptors.append(ResumableInterceptor(keys_to_accumulate))
+        interceptors.append(ResumableInterceptor(RESUMABLE_KEYS))
 
     if output:
         logger.info("Enabling stdout output for treadmill data.")
-        interceptors.append(StdoutInterceptor(get_serializer(output)))
+        interceptors.append(StdoutInterceptor(get_serializer(output), keys))
 
     gui: Gui | None = None
     if not headless:
@@ -93,11 +117,31 @@ async def main(
 
         interceptors.append(GuiUpdateInterceptor(gui))
 
-    producers: list[UpdateProducer] = [MtfsProducer(address)]
+    allowed_keys = resolve_interested_keys(interceptors)
+    if allowed_keys is not None:
+        logger.debug(f"Limiting treadmill data to keys: {sorted(allowed_keys)}")
+
+    producers: list[UpdateProducer] = []
+
+    replay_finished = threading.Event()
+    if replay:
+        logger.info(f"Replaying raw treadmill data from {replay}.")
+        producers.append(
+            CaptureReplayProducer(
+                replay,
+                allowed_keys,
+                on_finished=replay_finished.set if headless else None,
+            )
+        )
+    elif capture:
+        logger.info(f"Capturing raw treadmill data to {capture}.")
+        producers.append(MtfsCaptureProducer(capture, address))
+    else:
+        producers.append(MtfsProducer(address, allowed_keys))
 
     if input:
         logger.info("Enabling stdin input for treadmill data.")
-        producers.append(StdinProducer(get_serializer(input)))
+        producers.append(StdinProducer(get_serializer(input), allowed_keys))
 
     queue = janus.Queue[TreadmillUpdate]()
     producer_start_task = asyncio.gather(
@@ -112,7 +156,11 @@ async def main(
                     run_interceptor_chain(interceptors, update)
 
             except asyncio.TimeoutError:
-                continue
+                pass
+
+            if replay_finished.is_set() and queue.async_q.empty():
+                logger.info("Replay finished.")
+                close_event.set()
 
     try:
         await process_updates()
@@ -120,8 +168,67 @@ async def main(
         logger.info("Shutting down...")
         close_event.set()
 
-        await producer_start_task
-        await asyncio.gather(*[producer.stop() for producer in producers])
+        try:
+            await producer_start_task
+            await asyncio.gather(*[producer.stop() for producer in producers])
+        finally:
+            if gui is not None:
+                gui.stop()
+
+
+@app.command
+def convert(
+    inputs: list[str],
+    output: Annotated[Format, Parameter(name=["-o", "--output"])],
+    input: Annotated[Format | None, Parameter(name=["-i", "--input"])] = None,
+    output_dir: Annotated[Path | None, Parameter(name=["-d", "--output-dir"])] = None,
+    keys: Annotated[
+        list[str] | None, Parameter(name=["-k", "--keys"], validator=validate_keys)
+    ] = None,
+    resumable: Annotated[
+        bool, Parameter(name=["-r", "--resumable"], negative="")
+    ] = False,
+    jobs: Annotated[
+        int | None,
+        Parameter(name=["-j", "--jobs"], validator=validators.Number(gte=1)),
+    ] = None,
+    verbose: Annotated[bool, Parameter(negative="")] = False,
+):
+    """
+    Convert or re-process treadmill data log files in parallel.
+
+    Each input file is treated as a separate session and written to a file with the same name and the output format's extension.
+
+    Args:
+        inputs: Paths or glob patterns of log files to convert.
+        output: Format of the converted files.
+        input: Optional format of the input files, inferred from file extensions if not specified.
+        output_dir: Optional directory to write converted files to, keeping the directory structure of the inputs; defaults to the directory of each input file.
+        keys: Optional keys of treadmill data to keep, all keys are kept if not specified.
+        resumable: Accumulate certain metrics across resets within each file.
+        jobs: Number of worker processes, defaults to the number of CPUs.
+        verbose: Enable verbose logging.
+    """
+    setup_logging(verbose)
+
+    sources = expand_inputs(inputs)
+    if not sources:
+        logger.error("No input files to convert.")
+        sys.exit(1)
+
+    logger.info(f"Converting {len(sources)} file(s) to {output}...")
+    total, failed = convert_files(
+        sources,
+        output,
+        input=input,
+        output_dir=output_dir,
+        keys=keys,
+        resumable=resumable,
+        jobs=jobs,
+    )
+
+    if failed:
+        logger.error(f"Wrote {total} updates, {failed} file(s) failed to convert.")
+        sys.exit(1)
 
-        if gui is not None:
-            gui.stop()
+    logger.info(f"Done, wrote {total} updates.")
@@ -0,0 +1,109 @@
+from collections.abc import Iterator
+from dataclasses import dataclass
+import datetime as dt
+from pathlib import Path
+import queue
+import struct
+import threading
+import time
+from typing import BinaryIO
+
+__all__ = ["CaptureFrame", "CaptureWriter", "read_capture"]
+
+# File layout: magic, version and wall-clock start time as POSIX microseconds,
+# followed by frames of nanoseconds since start, payload length and payload.
+MAGIC = b"TMFC"
+VERSION = 1
+HEADER = struct.Struct("<4sBq")
+FRAME_HEADER = struct.Struct("<QH")
+
+
+@dataclass
+class CaptureFrame:
+    offset_ns: int
+    payload: bytes
+
+
+class CaptureWriter:
+    """
+    Writer of raw FTMS characteristic payloads into a compact binary capture file.
+
+    `write` only timestamps and enqueues the payload, so it is cheap enough to be called directly from BLE callbacks;
+    encoding and file I/O happen on a background thread. Payloads written before `open` are kept and flushed once the
+    file is open, with offsets relative to the creation of the writer.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._queue: queue.SimpleQueue[tuple[int, bytes] | None] = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._started_at = dt.datetime.now(dt.timezone.utc)
+        self._start_ns = time.monotonic_ns()
+
+    def open(self):
+        assert self._thread is None, "CaptureWriter is already open."
+
+        file = self.path.open("wb")
+        file.write(HEADER.pack(MAGIC, VERSION, _to_micros(self._started_at)))
+
+        self._thread = threading.Thread(
+            target=self._run_writer, args=(file,), daemon=True
+        )
+        self._thread.start()
+
+    def write(self, payload: bytes | bytearray):
+        self._queue.put((time.monotonic_ns(), bytes(payload)))
+
+    def close(self):
+        if self._thread is None:
+            return
+
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def _run_writer(self, file: BinaryIO):
+        with file:
+            while (item := self._queue.get()) is not None:
+                timestamp_ns, payload = item
+                file.write(
+                    FRAME_HEADER.pack(timestamp_ns - self._start_ns, len(payload))
+                )
+                file.write(payload)
+
+
+def read_capture(path: Path) -> tuple[dt.datetime, Iterator[CaptureFrame]]:
+    """
+    Open a capture file, returning its wall-clock start time and a lazy iterator over its frames.
+    """
+    file = path.open("rb")
+    try:
+        magic, version, started_at = HEADER.unpack(file.read(HEADER.size))
+    except struct.error as e:
+        file.close()
+        raise ValueError(f"Invalid capture file: {path}") from e
+
+    if magic != MAGIC or version != VERSION:
+        file.close()
+        raise ValueError(f"Unsupported capture file: {path}")
+
+    def frames() -> Iterator[CaptureFrame]:
+        with file:
+            while header := file.read(FRAME_HEADER.size):
+                if len(header) < FRAME_HEADER.size:
+                    raise ValueError(f"Truncated capture file: {path}")
+                offset_ns, length = FRAME_HEADER.unpack(header)
+                payload = file.read(length)
+                if len(payload) < length:
+                    raise ValueError(f"Truncated capture file: {path}")
+                yield CaptureFrame(offset_ns=offset_ns, payload=payload)
+
+    return _from_micros(started_at), frames()
+
+
+def _to_micros(timestamp: dt.datetime) -> int:
+    return int(timestamp.timestamp() * 1_000_000)
+
+
+def _from_micros(micros: int) -> dt.datetime:
+    return dt.datetime.fromtimestamp(micros / 1_000_000)
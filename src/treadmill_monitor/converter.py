@@ -0,0 +1,145 @@
+from collections.abc import Collection, Iterable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import glob
+import os
+from pathlib import Path
+
+from loguru import logger
+
+from treadmill_monitor.interceptors import (
+    RESUMABLE_KEYS,
+    ResumableInterceptor,
+    UpdateInterceptor,
+    run_interceptor_chain,
+)
+from treadmill_monitor.models import TreadmillUpdate
+from treadmill_monitor.serializers import Format, get_serializer
+
+__all__ = ["expand_inputs", "convert_file", "convert_files"]
+
+
+def expand_inputs(patterns: Iterable[str]) -> list[Path]:
+    """
+    Expand input paths and glob patterns into a sorted list of unique files.
+    """
+    paths: set[Path] = set()
+    for pattern in patterns:
+        matches = glob.glob(pattern, recursive=True)
+        if not matches:
+            logger.warning(f"No files matched '{pattern}'.")
+        paths.update(Path(match) for match in matches if Path(match).is_file())
+
+    return sorted(paths)
+
+
+def convert_file(
+    source: Path,
+    destination: Path,
+    output: Format,
+    input: Format | None = None,
+    keys: Collection[str] | None = None,
+    resumable: bool = False,
+) -> int:
+    """
+    Convert a single log file, treating it as one session. Returns the number of written updates.
+
+    If `input` is not given, the format is inferred from the file extension. If `keys` are given, other keys are skipped
+    before being deserialized.
+    """
+    reader = get_serializer(input or source.suffix.removeprefix("."))
+    writer = get_serializer(output)
+
+    interceptors: list[UpdateInterceptor] = []
+    if resumable:
+        interceptors.append(ResumableInterceptor(RESUMABLE_KEYS))
+
+    with source.open("r", encoding="utf-8") as f:
+        updates = list(reader.deserialize_batch(f, keys))
+
+    if interceptors:
+        intercepted: list[TreadmillUpdate] = []
+        for update in updates:
+            run_interceptor_chain(interceptors, update, intercepted.append)
+        updates = intercepted
+
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    with destination.open("w", encoding="utf-8", newline="") as f:
+        f.write(writer.serialize_batch(updates))
+
+    return len(updates)
+
+
+def convert_files(
+    sources: Iterable[Path],
+    output: Format,
+    input: Format | None = None,
+    output_dir: Path | None = None,
+    keys: Collection[str] | None = None,
+    resumable: bool = False,
+    jobs: int | None = None,
+) -> tuple[int, int]:
+    """
+    Convert many log files in parallel across a process pool. Returns the total number of written updates and the
+    number of files that failed to convert.
+
+    With `output_dir`, the directory structure of the inputs relative to their common parent is kept.
+    """
+    sources = list(sources)
+    common_parent = (
+        Path(os.path.commonpath([source.resolve().parent for source in sources]))
+        if sources
+        else None
+    )
+
+    destinations: dict[Path, list[Path]] = {}
+    for source in sources:
+        name = source.with_suffix(f".{output}").name
+        if output_dir is not None and common_parent is not None:
+            relative = source.resolve().parent.relative_to(common_parent)
+            destination = output_dir / relative / name
+        else:
+            destination = source.parent / name
+        destinations.setdefault(destination.resolve(), []).append(source)
+
+    failed = 0
+    tasks: dict[Path, Path] = {}
+    for destination, destination_sources in destinations.items():
+        if len(destination_sources) > 1:
+            names = ", ".join(str(source) for source in destination_sources)
+            logger.error(f"Skipping {names}: all would be written to {destination}.")
+            failed += len(destination_sources)
+            continue
+
+        source = destination_sources[0]
+        if destination == source.resolve():
+            logger.error(f"Skipping {source}: refusing to overwrite the input file.")
+            failed += 1
+            continue
+
+        tasks[source] = destination
+
+    if keys is not None:
+        keys = frozenset(keys)
+
+    total = 0
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(
+                convert_file, source, destination, output, input, keys, resumable
+            ): source
+            for source, destination in tasks.items()
+        }
+
+        for future in as_completed(futures):
+            source = futures[future]
+            try:
+                count = future.result()
+            except Exception as e:
+                logger.error(f"Failed to convert {source}: {e}")
+                failed += 1
+                continue
+
+            logger.info(f"Converted {source} -> {tasks[source]} ({count} updates).")
+            total += count
+
+    return total, failed
@@ -8,6 +8,17 @@ import webview
 from treadmill_monitor.models import TreadmillUpdate
 
 
+GUI_KEYS = frozenset(
+    {
+        "training_status",
+        "speed_instant",
+        "time_elapsed",
+        "distance_total",
+        "energy_total",
+    }
+)
+
+
 class Gui:
     def __init__(self, debug: bool = False, confirm_close: bool = False):
         self.debug = debug
@@ -1,14 +1,17 @@
 import sys
-from collections.abc import Callable, Iterable
+from collections.abc import Callable, Collection, Iterable
 
 from treadmill_monitor.serializers import UpdateSerializer
 
 from loguru import logger
 
-from treadmill_monitor.gui import Gui
+from treadmill_monitor.gui import GUI_KEYS, Gui
 from treadmill_monitor.models import TreadmillUpdate
 
 
+RESUMABLE_KEYS = ["time_elapsed", "distance_total", "energy_total"]
+
+
 class UpdateInterceptor:
     """
     Base class for treadmill update interceptors.
@@ -22,12 +25,34 @@ class UpdateInterceptor:
         """
         next(update)
 
+    def interested_keys(self) -> frozenset[str] | None:
+        """
+        Keys this interceptor needs to receive, `None` meaning all keys. Interceptors that only pass updates along
+        should return an empty set.
+        """
+        return None
+
+
+def resolve_interested_keys(
+    interceptors: Iterable[UpdateInterceptor],
+) -> frozenset[str] | None:
+    """Combine key interest of all interceptors into a single allow-set, `None` meaning all keys."""
+    keys: frozenset[str] = frozenset()
+    for interceptor in interceptors:
+        interceptor_keys = interceptor.interested_keys()
+        if interceptor_keys is None:
+            return None
+        keys |= interceptor_keys
+
+    return keys
+
 
 def run_interceptor_chain(
     interceptors: Iterable[UpdateInterceptor],
     update: TreadmillUpdate,
+    final: Callable[[TreadmillUpdate], None] | None = None,
 ):
-    """Run a chain of update interceptors."""
+    """Run a chain of update interceptors, passing the resulting update to `final` if given."""
 
     def build_chain(
         interceptors: Iterable[UpdateInterceptor],
@@ -46,13 +71,23 @@ def run_interceptor_chain(
     def final_handler(update: TreadmillUpdate):
         pass  # No-op final handler
 
-    chain = build_chain(interceptors, final_handler)
+    chain = build_chain(interceptors, final or final_handler)
     chain(update)
 
 
+def _level_no(level: str | int) -> int:
+    return level if isinstance(level, int) else logger.level(level).no
+
+
 class LoggingInterceptor(UpdateInterceptor):
-    def __init__(self, level: str | int = "DEBUG"):
+    def __init__(self, level: str | int = "DEBUG", *, min_level: str | int):
         self.level = level
+        self.min_level = min_level
+
+    def interested_keys(self) -> frozenset[str] | None:
+        if _level_no(self.level) >= _level_no(self.min_level):
+            return None
+        return frozenset()
 
     def intercept(
         self, update: TreadmillUpdate, next: Callable[[TreadmillUpdate], None]
@@ -71,6 +106,9 @@ class ResumableInterceptor(UpdateInterceptor):
         self.active = dict()
         self.accumulate = dict()
 
+    def interested_keys(self) -> frozenset[str] | None:
+        return frozenset()
+
     def intercept(
         self, update: TreadmillUpdate, next: Callable[[TreadmillUpdate], None]
     ):
@@ -99,15 +137,25 @@ class ResumableInterceptor(UpdateInterceptor):
 
 class StdoutInterceptor(UpdateInterceptor):
     """
-    Interceptor that logs updates to stdout in CSV format of `timestamp,key,value`.
+    Interceptor that logs updates to stdout in CSV format of `timestamp,key,value`, optionally limited to given keys.
     """
 
-    def __init__(self, output_format: UpdateSerializer):
+    def __init__(
+        self, output_format: UpdateSerializer, keys: Collection[str] | None = None
+    ):
         self.output_format = output_format
+        self.keys = frozenset(keys) if keys is not None else None
+
+    def interested_keys(self) -> frozenset[str] | None:
+        return self.keys
 
     def intercept(
         self, update: TreadmillUpdate, next: Callable[[TreadmillUpdate], None]
     ):
+        if self.keys is not None and update.key not in self.keys:
+            next(update)
+            return
+
         serialized = self.output_format.serialize(update)
         print(serialized, file=sys.stdout, flush=True)
         next(update)
@@ -121,6 +169,9 @@ class GuiUpdateInterceptor(UpdateInterceptor):
     def __init__(self, gui: Gui):
         self.gui = gui
 
+    def interested_keys(self) -> frozenset[str] | None:
+        return GUI_KEYS
+
     def intercept(
         self, update: TreadmillUpdate, next: Callable[[TreadmillUpdate], None]
     ):
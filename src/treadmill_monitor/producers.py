@@ -1,16 +1,31 @@
 import asyncio
+from collections.abc import Callable, Collection, Mapping
+import dataclasses
 import datetime as dt
+from pathlib import Path
 import sys
+import threading
+import typing
 
 import bleak
 import janus
 import pyftms
 from loguru import logger
+from pyftms.models import TreadmillData
+from pyftms.serializer import get_serializer
 
-from treadmill_monitor.models import TreadmillUpdate
+from treadmill_monitor.capture import CaptureWriter, read_capture
+from treadmill_monitor.models import TreadmillUpdate, UpdateValue
 from treadmill_monitor.serializers import UpdateSerializer
 
-__all__ = ["UpdateProducer", "StdinProducer", "MtfsProducer"]
+__all__ = [
+    "UpdateProducer",
+    "StdinProducer",
+    "MtfsProducer",
+    "MtfsCaptureProducer",
+    "CaptureReplayProducer",
+    "TREADMILL_KEYS",
+]
 
 
 class UpdateProducer:
@@ -22,8 +37,11 @@ class UpdateProducer:
 
 
 class StdinProducer(UpdateProducer):
-    def __init__(self, serializer: UpdateSerializer):
+    def __init__(
+        self, serializer: UpdateSerializer, keys: Collection[str] | None = None
+    ):
         self.serializer = serializer
+        self.keys = keys
         self._stdin_task: asyncio.Task | None = None
 
     async def start(self, queue: janus.Queue[TreadmillUpdate]):
@@ -31,6 +49,9 @@ class StdinProducer(UpdateProducer):
 
         def read_stdin():
             for line in sys.stdin:
+                if not self.serializer.matches_keys(line, self.keys):
+                    continue
+
                 try:
                     update = self.serializer.deserialize(line)
                     queue.sync_q.put(update)
@@ -48,54 +69,150 @@ class StdinProducer(UpdateProducer):
                 pass
 
 
+def _model_keys(model: type) -> frozenset[str]:
+    keys: frozenset[str] = frozenset()
+    hints = typing.get_type_hints(model)
+    for field in dataclasses.fields(model):
+        nested = [
+            t for t in typing.get_args(hints[field.name]) if dataclasses.is_dataclass(t)
+        ]
+        keys |= _model_keys(nested[0]) if nested else {field.name}
+
+    return keys
+
+
+TREADMILL_KEYS = _model_keys(TreadmillData) | {
+    "training_status",
+    "training_status_string",
+}
+"""Keys of all treadmill data reported by pyftms."""
+
+
 FTMS_SERVICE_UUID = "00001826-0000-1000-8000-00805f9b34fb"
+TREADMILL_DATA_UUID = "00002acd-0000-1000-8000-00805f9b34fb"
 
 
-class MtfsProducer(UpdateProducer):
-    def __init__(self, address: str | None = None):
-        self.address = address
-        self.client: pyftms.FitnessMachine | None = None
+async def find_device(address: str | None = None) -> bleak.BLEDevice | None:
+    if address is None:
+        logger.info("Scanning for MTFS-enabled treadmill devices...")
+        devices = await bleak.BleakScanner.discover(
+            service_uuids=[FTMS_SERVICE_UUID],
+        )
 
-    async def start(self, queue: janus.Queue[TreadmillUpdate]):
-        if self.address is None:
-            logger.info("Scanning for MTFS-enabled treadmill devices...")
-            devices = await bleak.BleakScanner.discover(
-                service_uuids=[FTMS_SERVICE_UUID],
+        if not devices:
+            raise RuntimeError("No MTFS devices found.")
+
+        if len(devices) > 1:
+            logger.warning(
+                "Multiple MTFS-enabled treadmill devices found. Connecting to the first one."
             )
 
-            if not devices:
-                raise RuntimeError("No MTFS devices found.")
+        device = devices[0]
+    else:
+        logger.info(f"Looking for device with address {address}...")
+        device = await bleak.BleakScanner.find_device_by_address(
+            address, service_uuids=[FTMS_SERVICE_UUID]
+        )
 
-            if len(devices) > 1:
-                logger.warning(
-                    "Multiple MTFS-enabled treadmill devices found. Connecting to the first one."
-                )
+        if device is None:
+            logger.error(f"Could not find device with address {address}")
+            return None
 
-            device = devices[0]
-        else:
-            logger.info(f"Looking for device with address {self.address}...")
-            device = await bleak.BleakScanner.find_device_by_address(
-                self.address, service_uuids=[FTMS_SERVICE_UUID]
-            )
+    return device
 
-            if device is None:
-                logger.error(f"Could not find device with address {self.address}")
-                return
 
-        logger.info(f"Connecting to device: {device.name} ({device.address})")
+def enqueue_updates(
+    queue: janus.Queue[TreadmillUpdate],
+    timestamp: dt.datetime,
+    data: Mapping[str, UpdateValue],
+    keys: Collection[str] | None = None,
+):
+    """Enqueue treadmill updates for all values in `data`, optionally limited to given keys."""
+    for key, value in data.items():
+        if keys is not None and key not in keys:
+            continue
 
-        def on_ftms_event(event: pyftms.FtmsEvents):
-            if isinstance(event, pyftms.UpdateEvent):
-                for key, value in event.event_data.items():
-                    update = TreadmillUpdate(
-                        timestamp=dt.datetime.now(),
-                        key=key,
-                        value=value,
-                    )
-                    queue.sync_q.put(update)
+        update = TreadmillUpdate(
+            timestamp=timestamp,
+            key=key,
+            value=value,
+        )
+        queue.sync_q.put(update)
+
+
+def ftms_event_handler(
+    queue: janus.Queue[TreadmillUpdate],
+    keys: Collection[str] | None = None,
+):
+    """Create a pyftms event callback that enqueues treadmill updates, optionally limited to given keys."""
+
+    def on_ftms_event(event: pyftms.FtmsEvents):
+        if isinstance(event, pyftms.UpdateEvent):
+            enqueue_updates(queue, dt.datetime.now(), event.event_data, keys)
+
+    return on_ftms_event
+
+
+class TreadmillDataDecoder:
+    """
+    Decoder of raw treadmill data payloads, following how pyftms handles live notifications: payloads with the
+    More Data bit set are merged with the following ones, empty data is ignored and only changed values are returned.
+    """
+
+    def __init__(self):
+        self._serializer = get_serializer(TreadmillData)
+        self._prev: dict[str, UpdateValue] = {}
+        self._result: dict[str, UpdateValue] = {}
+
+    def decode(self, payload: bytes) -> dict[str, UpdateValue]:
+        data = self._serializer.deserialize(payload)
+        self._result |= _flatten(dataclasses.asdict(data))
+
+        if payload[0] & 1:
+            return {}
+
+        update: dict[str, UpdateValue] = {}
+        if any(self._result.values()):
+            update = {
+                key: value
+                for key, value in self._result.items()
+                if key not in self._prev or self._prev[key] != value
+            }
+            if update:
+                self._prev = self._result.copy()
+
+        self._result = {}
+        return update
+
+
+def _flatten(data: dict) -> dict[str, UpdateValue]:
+    result = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            result |= _flatten(value)
+        elif value is not None:
+            result[key] = value
+
+    return result
+
+
+class MtfsProducer(UpdateProducer):
+    def __init__(self, address: str | None = None, keys: Collection[str] | None = None):
+        self.address = address
+        self.keys = keys
+        self.client: pyftms.FitnessMachine | None = None
+
+    async def start(self, queue: janus.Queue[TreadmillUpdate]):
+        device = await find_device(self.address)
+        if device is None:
+            return
+
+        logger.info(f"Connecting to device: {device.name} ({device.address})")
 
         self.client = pyftms.get_client(
-            device, pyftms.MachineType.TREADMILL, on_ftms_event=on_ftms_event
+            device,
+            pyftms.MachineType.TREADMILL,
+            on_ftms_event=ftms_event_handler(queue, self.keys),
         )
 
         await self.client.connect()
@@ -107,3 +224,113 @@ class MtfsProducer(UpdateProducer):
             logger.info("Disconnecting from treadmill...")
             await self.client.disconnect()
             logger.info("Disconnected successfully.")
+
+
+class MtfsCaptureProducer(UpdateProducer):
+    """
+    Producer that records raw treadmill data payloads into a capture file without decoding them.
+
+    No updates are produced; use `CaptureReplayProducer` to decode the capture later.
+    """
+
+    def __init__(self, path: Path, address: str | None = None):
+        self.path = path
+        self.address = address
+        self.client: bleak.BleakClient | None = None
+        self._writer = CaptureWriter(path)
+
+    async def start(self, queue: janus.Queue[TreadmillUpdate]):
+        device = await find_device(self.address)
+        if device is None:
+            return
+
+        logger.info(f"Connecting to device: {device.name} ({device.address})")
+
+        self.client = bleak.BleakClient(device)
+        await self.client.connect()
+
+        try:
+            # Frames received before the writer is open are queued, so the file is only touched once subscribed.
+            await self.client.start_notify(
+                TREADMILL_DATA_UUID, lambda _, data: self._writer.write(data)
+            )
+            self._writer.open()
+        except BaseException:
+            await self.client.disconnect()
+            self.client = None
+            raise
+
+        logger.info(f"Connected successfully, capturing raw data to {self.path}.")
+
+    async def stop(self):
+        if self.client is not None:
+            logger.info("Disconnecting from treadmill...")
+            await self.client.disconnect()
+            logger.info("Disconnected successfully.")
+
+        self._writer.close()
+
+
+class CaptureReplayProducer(UpdateProducer):
+    """
+    Producer that decodes a capture file recorded by `MtfsCaptureProducer` frame by frame through pyftms.
+
+    Frames that fail to decode are logged and skipped, like malformed live notifications.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        keys: Collection[str] | None = None,
+        on_finished: Callable[[], None] | None = None,
+    ):
+        self.path = path
+        self.keys = keys
+        self.on_finished = on_finished
+        self._replay_task: asyncio.Future | None = None
+        self._stop_event = threading.Event()
+
+    async def start(self, queue: janus.Queue[TreadmillUpdate]):
+        loop = asyncio.get_running_loop()
+        decoder = TreadmillDataDecoder()
+
+        def replay():
+            count, failed = 0, 0
+            try:
+                started_at, frames = read_capture(self.path)
+                for frame in frames:
+                    if self._stop_event.is_set():
+                        logger.info("Replay stopped.")
+                        break
+
+                    try:
+                        data = decoder.decode(frame.payload)
+                    except Exception as e:
+                        logger.error(
+                            f"Failed to decode frame at {frame.offset_ns / 1e9:.3f}s"
+                            f" ({frame.payload.hex(' ').upper()}): {e!r}"
+                        )
+                        failed += 1
+                        continue
+
+                    timestamp = started_at + dt.timedelta(
+                        microseconds=frame.offset_ns // 1000
+                    )
+                    enqueue_updates(queue, timestamp, data, self.keys)
+                    count += 1
+            except (OSError, ValueError) as e:
+                logger.error(e)
+
+            logger.info(
+                f"Replayed {count} frames from {self.path}, {failed} failed to decode."
+            )
+
+            if self.on_finished is not None:
+                self.on_finished()
+
+        self._replay_task = loop.run_in_executor(None, replay)
+
+    async def stop(self):
+        if self._replay_task is not None:
+            self._stop_event.set()
+            await self._replay_task
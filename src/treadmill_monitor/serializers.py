@@ -1,10 +1,18 @@
 from abc import ABC, abstractmethod
+from collections.abc import Container, Iterable, Iterator
 import datetime as dt
 import json
+import re
+from typing import Literal
+
+from loguru import logger
 
 from treadmill_monitor.models import TreadmillUpdate
 
 
+Format = Literal["csv", "jsonl"]
+
+
 def parse_value(value_str: str):
     try:
         if "." in value_str:
@@ -24,6 +32,34 @@ class UpdateSerializer(ABC):
     def deserialize(self, data: str) -> TreadmillUpdate:
         pass
 
+    def read_key(self, data: str) -> str | None:
+        """Extract the key without fully deserializing the data, `None` if not possible."""
+        return None
+
+    def matches_keys(self, data: str, keys: Container[str] | None) -> bool:
+        """Cheaply check whether the data may hold one of the keys, `None` matching all keys."""
+        if keys is None:
+            return True
+
+        key = self.read_key(data)
+        return key is None or key in keys
+
+    def serialize_batch(self, updates: Iterable[TreadmillUpdate]) -> str:
+        """Serialize many updates at once into newline-terminated lines."""
+        return "".join(f"{self.serialize(update)}\n" for update in updates)
+
+    def deserialize_batch(
+        self, lines: Iterable[str], keys: Container[str] | None = None
+    ) -> Iterator[TreadmillUpdate]:
+        """Deserialize many lines at once, logging and skipping invalid ones and ones without wanted keys."""
+        for line in lines:
+            if not line.strip() or not self.matches_keys(line, keys):
+                continue
+            try:
+                yield self.deserialize(line)
+            except ValueError as e:
+                logger.error(e)
+
 
 class CsvSerializer(UpdateSerializer):
     def __init__(self, allow_missing_timestamp: bool = False):
@@ -32,6 +68,13 @@ class CsvSerializer(UpdateSerializer):
     def serialize(self, update: TreadmillUpdate) -> str:
         return f"{update.timestamp.isoformat()},{update.key},{update.value}"
 
+    def read_key(self, data: str) -> str | None:
+        match data.strip().rsplit(",", 2):
+            case [_, key, _] | [key, _]:
+                return key
+            case _:
+                return None
+
     def deserialize(self, data: str) -> TreadmillUpdate:
         match data.strip().split(","):
             case [timestamp_str, key, value]:
@@ -40,11 +83,16 @@ class CsvSerializer(UpdateSerializer):
                 return TreadmillUpdate(timestamp=timestamp, key=key, value=value_parsed)
             case [key, value] if self.allow_missing_timestamp:
                 value_parsed = parse_value(value)
-                return TreadmillUpdate(key=key, value=value_parsed)
+                return TreadmillUpdate(
+                    timestamp=dt.datetime.now(), key=key, value=value_parsed
+                )
             case _:
                 raise ValueError(f"Invalid CSV row: {data.strip()}")
 
 
+JSONL_KEY_PATTERN = re.compile(r'"key"\s*:\s*"([^"\\]*)"')
+
+
 class JsonlSerializer(UpdateSerializer):
     def serialize(self, update: TreadmillUpdate) -> str:
         data = {
@@ -54,14 +102,29 @@ class JsonlSerializer(UpdateSerializer):
         }
         return json.dumps(data, indent=None)
 
-    def deserialize(self, data: str) -> TreadmillUpdate:
-        import json
+    def read_key(self, data: str) -> str | None:
+        match = JSONL_KEY_PATTERN.search(data)
+        return match.group(1) if match else None
 
-        obj = json.loads(data)
+    def deserialize(self, data: str) -> TreadmillUpdate:
         try:
-            timestamp = dt.datetime.fromisoformat(obj["timestamp"])
+            obj = json.loads(data)
+            if not isinstance(obj, dict):
+                raise ValueError("Expected a JSON object")
+            timestamp_str = obj["ts"] if "ts" in obj else obj["timestamp"]
+            timestamp = dt.datetime.fromisoformat(timestamp_str)
             key = obj["key"]
             value = parse_value(str(obj["value"]))
             return TreadmillUpdate(timestamp=timestamp, key=key, value=value)
-        except (KeyError, ValueError) as e:
-            raise ValueError(f"Invalid JSON data: {data}") from e
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid JSON data: {data.strip()}") from e
+
+
+def get_serializer(format: Format) -> UpdateSerializer:
+    match format:
+        case "csv":
+            return CsvSerializer(allow_missing_timestamp=True)
+        case "jsonl":
+            return JsonlSerializer()
+        case _:
+            raise ValueError(f"Unsupported format: {format}")